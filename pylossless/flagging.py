@@ -73,9 +73,10 @@ class FlaggedChs(dict):
         if isinstance(bad_ch_names, xr.DataArray):
             bad_ch_names = bad_ch_names.values
         self[kind] = bad_ch_names
-        flagged_chs = list(self.values())
-        flagged_chs = np.unique(np.concatenate(flagged_chs))  # drop duplicates
-        self['manual'] = flagged_chs.tolist()
+        # 'manual' already holds the union of the previous categories,
+        # so only the new channels need to be merged in.
+        flagged_chs = np.concatenate([self['manual'], bad_ch_names])
+        self['manual'] = np.unique(flagged_chs).tolist()  # drop duplicates
 
     def rereference(self, inst, **kwargs):
         """Re-reference the Raw object attached to the LosslessPipeline.
@@ -182,7 +183,10 @@ class FlaggedEpochs(dict):
             being assessed by the LosslessPipeline.
         """
         self[kind] = bad_epoch_inds
-        self['manual'] = np.unique(np.concatenate(list(self.values())))
+        # 'manual' already holds the union of the previous categories,
+        # so only the new epochs need to be merged in.
+        self['manual'] = np.unique(np.concatenate([self['manual'],
+                                                   bad_epoch_inds]))
         self.ll.add_pylossless_annotations(bad_epoch_inds, kind, epochs)
 
     def load_from_raw(self, raw):
@@ -8,22 +8,24 @@
 """Classes and Functions for running the Lossless Pipeline."""
 
 from pathlib import Path
-from functools import partial
+import hashlib
+import warnings
+import json
+from functools import lru_cache
 
 # Math and data structures
 import numpy as np
-import pandas as pd
 import xarray as xr
-import scipy
-from scipy.spatial import distance_matrix
-from tqdm import tqdm
+from scipy.spatial import cKDTree
+from threadpoolctl import threadpool_info, threadpool_limits
+from joblib import Parallel, delayed, effective_n_jobs
 
 # BIDS, MNE, and ICA
 import mne
 from mne.preprocessing import annotate_break
 from mne.preprocessing import ICA
 from mne.coreg import Coregistration
-from mne.utils import logger
+from mne.utils import logger, check_version
 import mne_bids
 from mne_bids import get_bids_path_from_fname, BIDSPath
 
@@ -32,6 +34,33 @@ from .flagging import FlaggedChs, FlaggedEpochs, FlaggedICs
 from ._logging import lossless_logger, lossless_time
 
 
+def _get_data(epochs):
+    """Get the data of an mne.Epochs, without copying it when possible.
+
+    The returned array can be a view on the data of ``epochs`` and must not
+    be modified in place.
+    """
+    # Before MNE 1.6, get_data always returns a view when no picks are given.
+    if check_version('mne', '1.6'):
+        return epochs.get_data(copy=False)
+    return epochs.get_data()
+
+
+def _get_epochs_data(epochs, kind="ch", ica=None):
+    """Get the data and names of the channels or ICs of an mne.Epochs."""
+    if kind == "ch":
+        data = _get_data(epochs)  # n_epochs, n_channels, n_times
+        names = epochs.ch_names
+    elif kind == "ic":
+        data = _get_data(ica.get_sources(epochs))
+        names = ica._ica_names
+
+    else:
+        raise ValueError("The argument kind must be equal to 'ch' or 'ic'.")
+
+    return data, names
+
+
 def epochs_to_xr(epochs, kind="ch", ica=None):
     """Create an Xarray DataArray from an instance of mne.Epochs.
 
@@ -54,22 +83,40 @@ def epochs_to_xr(epochs, kind="ch", ica=None):
         ``'time'`` (samples), and either ``'ch'`` (channels) or ``'ic'``
         (independent components).
     """
-    if kind == "ch":
-        data = epochs.get_data()  # n_epochs, n_channels, n_times
-        names = epochs.ch_names
-    elif kind == "ic":
-        data = ica.get_sources(epochs).get_data()
-        names = ica._ica_names
-
-    else:
-        raise ValueError("The argument kind must be equal to 'ch' or 'ic'.")
-
+    data, names = _get_epochs_data(epochs, kind=kind, ica=ica)
     return xr.DataArray(data,
                         coords={'epoch': np.arange(data.shape[0]),
                                 kind: names,
                                 "time": epochs.times})
 
 
+def _get_epochs_sd(epochs, kind="ch", ica=None):
+    """Compute the standard deviation across time of each epoch and channel.
+
+    Equivalent to ``epochs_to_xr(epochs, kind, ica).std("time")``, but the
+    reduction is done on the NumPy array so that only the reduced 2D array
+    is wrapped into an xarray.DataArray.
+
+    Returns
+    -------
+    xarray.DataArray
+        an instance of xarray.DataArray, with dimensions ``'epoch'`` and
+        either ``'ch'`` (channels) or ``'ic'`` (independent components).
+    """
+    data, names = _get_epochs_data(epochs, kind=kind, ica=ica)
+
+    # Single precision is sufficient for this memory-bound reduction. Since
+    # astype returns a copy, the data can then be centered in place and the
+    # sum of squares taken without allocating the squares.
+    data = data.astype(np.float32)
+    data -= data.mean(axis=-1, keepdims=True)
+    data_sd = np.sqrt(np.einsum('ijk,ijk->ij', data, data) / data.shape[-1])
+    return xr.DataArray(data_sd,
+                        dims=('epoch', kind),
+                        coords={'epoch': np.arange(data.shape[0]),
+                                kind: names})
+
+
 def get_operate_dim(array, flag_dim):
     """Get the xarray.DataArray dimension to flag for a pipeline method.
 
@@ -134,13 +181,74 @@ def _get_outliers_quantile(array, dim, lower=0.25, upper=0.75, mid=0.5, k=3):
     return mid_val - lower_dist*k, mid_val + upper_dist*k
 
 
+def _trim_mean_std(array, trim=0.2, axis=-1):
+    """Compute the trimmed mean and standard deviation along an axis.
+
+    Equivalent to :func:`scipy.stats.mstats.trimmed_mean` and
+    :func:`scipy.stats.mstats.trimmed_std` with ``limits=(trim, trim)``, but
+    both statistics are computed from a single partial sort of an unmasked
+    array rather than from a fully sorted masked array.
+
+    Parameters
+    ----------
+    array : array-like
+        Values to reduce.
+    trim : float (default 0.2)
+        Proportion of values to cut from each end of the distribution.
+    axis : int (default -1)
+        The axis along which to operate.
+
+    Returns
+    -------
+    trim_mean : numpy.ndarray
+        The trimmed mean.
+    trim_std : numpy.ndarray
+        The trimmed standard deviation.
+    """
+    array = np.moveaxis(np.asarray(array), axis, -1)
+    n_cut = int(trim * array.shape[-1])
+    stop = array.shape[-1] - n_cut
+    trimmed = np.partition(array, [n_cut, stop - 1], axis=-1)[..., n_cut:stop]
+    return trimmed.mean(axis=-1), trimmed.std(axis=-1)
+
+
+def _nan_trim_mean(array, proportiontocut):
+    """Compute the trimmed mean along the last axis, ignoring NaN.
+
+    Equivalent to :func:`scipy.stats.trim_mean` applied to each row after
+    its NaN values have been dropped, so that the number of values cut from
+    each end depends on the number of valid values in that row. Rows with
+    no valid values give NaN.
+
+    Parameters
+    ----------
+    array : numpy.ndarray
+        Values to reduce.
+    proportiontocut : float
+        Proportion of the valid values to cut from each end of each row.
+
+    Returns
+    -------
+    trim_mean : numpy.ndarray
+        The trimmed mean, with the last axis reduced.
+    """
+    # NaN values are sorted last, after the valid values of each row.
+    array = np.sort(array, axis=-1)
+    n_valid = np.count_nonzero(~np.isnan(array), axis=-1)
+    start = (proportiontocut * n_valid).astype(int)
+    stop = n_valid - start
+    pos = np.arange(array.shape[-1])
+    keep = (pos >= start[..., None]) & (pos < stop[..., None])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(keep, array, 0).sum(axis=-1) / (stop - start)
+
+
 def _get_outliers_trimmed(array, dim, trim=0.2, k=3):
     """Calculate outliers for Epochs or Channels based on the trimmed mean."""
-    trim_mean = partial(scipy.stats.mstats.trimmed_mean,
-                        limits=(trim, trim))
-    trim_std = partial(scipy.stats.mstats.trimmed_std, limits=(trim, trim))
-    m_dist = array.reduce(trim_mean, dim=dim)
-    s_dist = array.reduce(trim_std, dim=dim)
+    m_dist, s_dist = xr.apply_ufunc(_trim_mean_std, array,
+                                    input_core_dims=[[dim]],
+                                    output_core_dims=[[], []],
+                                    kwargs=dict(trim=trim))
     return m_dist - s_dist*k, m_dist + s_dist*k
 
 
@@ -245,8 +353,7 @@ def _threshold_volt_std(epochs, flag_dim, threshold=5e-5):
         raise ValueError('threshold must be an int, float, or a list/tuple'
                          f' of 2 int or float values. got {threshold}')
 
-    epochs_xr = epochs_to_xr(epochs, kind="ch")
-    data_sd = epochs_xr.std("time")
+    data_sd = _get_epochs_sd(epochs, kind="ch")
     # Flag channels or epochs if their std is above
     # a fixed threshold.
     outliers_kwargs = dict(lower=l_out, upper=u_out)
@@ -258,7 +365,43 @@ def _threshold_volt_std(epochs, flag_dim, threshold=5e-5):
     return volt_outlier_inds
 
 
-def chan_neighbour_r(epochs, nneigbr, method):
+def _get_neighbours(epochs, nneigbr):
+    """Find the nearest neighbours of each channel from the montage.
+
+    Parameters
+    ----------
+    epochs : mne.Epochs
+        an instance of mne.Epochs with a montage.
+    nneigbr : int
+        Number of neighbours to find for each channel. It is reduced to the
+        number of other channels if the montage has fewer.
+
+    Returns
+    -------
+    ch_names : list
+        Names of the channels, in the order of the montage.
+    nbr_idx : numpy.ndarray
+        Integer array of shape (n_channels, n_neighbours), where row ``i``
+        holds the indices in ``ch_names`` of the neighbours of channel ``i``,
+        from nearest to farthest.
+    """
+    ch_pos = epochs.get_montage().get_positions()['ch_pos']
+    ch_names = list(ch_pos)
+    chan_locs = np.array(list(ch_pos.values()))
+
+    # cKDTree pads the result with an out-of-range index when fewer points
+    # than requested exist, so never ask for more than the other channels.
+    nneigbr = min(nneigbr, len(ch_names) - 1)
+    # Query one extra neighbour since each channel is its own nearest point.
+    _, nbr_idx = cKDTree(chan_locs).query(chan_locs, k=nneigbr + 1)
+    nbr_idx = nbr_idx.reshape(len(ch_names), nneigbr + 1)
+    not_self = nbr_idx != np.arange(len(ch_names))[:, None]
+    not_self[not_self.all(axis=1), -1] = False
+    nbr_idx = nbr_idx[not_self].reshape(len(ch_names), nneigbr)
+    return ch_names, nbr_idx
+
+
+def chan_neighbour_r(epochs, nneigbr, method, neighbours=None):
     """Compute nearest Neighbor R.
 
     Parameters
@@ -272,58 +415,65 @@ def chan_neighbour_r(epochs, nneigbr, method):
         One of 'max', 'mean', or 'trimmean'. This is the function
         which aggregates the neighbours into one value.
 
+    neighbours : tuple | None
+        The ``(ch_names, nbr_idx)`` tuple returned by ``_get_neighbours``
+        for these epochs. If ``None``, it is computed from the montage.
+
     Returns
     -------
     Xarray : Xarray.DataArray
         An instance of Xarray.DataArray
     """
-    chan_locs = pd.DataFrame(epochs.get_montage().get_positions()['ch_pos']).T
-    chan_dist = pd.DataFrame(distance_matrix(chan_locs, chan_locs),
-                             columns=chan_locs.index,
-                             index=chan_locs.index)
-    rank = chan_dist.rank('columns', ascending=True) - 1
-    rank[rank == 0] = np.nan
-    nearest_neighbor = pd.DataFrame({ch_name: row.dropna()
-                                                 .sort_values()[:nneigbr]
-                                                 .index.values
-                                     for ch_name, row in rank.iterrows()}).T
-
-    r_list = []
-    for name, row in tqdm(list(nearest_neighbor.iterrows())):
-        this_ch = epochs.get_data(name)
-        nearest_chs = epochs.get_data(list(row.values))
-        this_ch_xr = xr.DataArray([this_ch * np.ones_like(nearest_chs)],
-                                  dims=['ref_chan', 'epoch',
-                                        'channel', 'time'],
-                                  coords={'ref_chan': [name],
-                                          'epoch': np.arange(len(epochs)),
-                                          'channel': row.values.tolist(),
-                                          'time': epochs.times
-                                          }
-                                  )
-        nearest_chs_xr = xr.DataArray([nearest_chs],
-                                      dims=['ref_chan', 'epoch',
-                                            'channel', 'time'],
-                                      coords={'ref_chan': [name],
-                                              'epoch': np.arange(len(epochs)),
-                                              'channel': row.values.tolist(),
-                                              'time': epochs.times})
-        r_list.append(xr.corr(this_ch_xr, nearest_chs_xr, dim=['time']))
-
-    c_neigbr_r = xr.concat(r_list, dim='ref_chan')
-
-    if method == 'max':
-        m_neigbr_r = xr.apply_ufunc(np.abs, c_neigbr_r).max(dim='channel')
-
-    elif method == 'mean':
-        m_neigbr_r = xr.apply_ufunc(np.abs, c_neigbr_r).mean(dim='channel')
-
-    elif method == 'trimmean':
-        trim_mean_10 = partial(scipy.stats.trim_mean, proportiontocut=0.1)
-        m_neigbr_r = xr.apply_ufunc(np.abs, c_neigbr_r)\
-                       .reduce(trim_mean_10, dim='channel')
-
-    return m_neigbr_r.rename(ref_chan="ch")
+    if neighbours is None:
+        neighbours = _get_neighbours(epochs, nneigbr)
+    ch_names, nbr_idx = neighbours
+
+    data = _get_data(epochs)
+    picks = mne.pick_channels(epochs.ch_names, ch_names, ordered=True)
+    if np.array_equal(picks, np.arange(len(epochs.ch_names))):
+        picks = slice(None)  # basic slicing, no need to copy the data
+
+    # The correlations between all pairs of channels are computed with one
+    # batched matrix product (BLAS gemm) per block of epochs, keeping only
+    # the entries of the neighbours. Blocking bounds the memory used by the
+    # (epoch, channel, channel) correlation matrices and by the single
+    # precision copy of the data.
+    n_epochs_block = 64
+    ref_idx = np.arange(len(ch_names))[:, None]
+    r_vals = np.empty((data.shape[0], *nbr_idx.shape), np.float32)
+    for start in range(0, data.shape[0], n_epochs_block):
+        # Center and normalize each channel within each epoch so that the
+        # Pearson correlation reduces to a dot product across time. Single
+        # precision is sufficient for the correlation values.
+        # Flat channels have a zero norm and get NaN correlations.
+        block = data[start:start + n_epochs_block, picks].astype(np.float32)
+        block -= block.mean(axis=-1, keepdims=True)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            block /= np.linalg.norm(block, axis=-1, keepdims=True)
+        corr = np.matmul(block, block.transpose(0, 2, 1))
+        r_vals[start:start + n_epochs_block] = corr[:, ref_idx, nbr_idx]
+    # Only the magnitude of the correlations is aggregated. r_vals is a
+    # local buffer, so take it in place rather than allocating a copy.
+    np.abs(r_vals, out=r_vals)
+
+    # Aggregate over the neighbours (last axis) on the NumPy buffer so that
+    # only the reduced (epoch, ch) array is wrapped into a DataArray. NaN
+    # correlations (flat channels) are skipped, and a channel with no valid
+    # correlation gets NaN.
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        if method == 'max':
+            m_neigbr_r = np.nanmax(r_vals, axis=-1)
+
+        elif method == 'mean':
+            m_neigbr_r = np.nanmean(r_vals, axis=-1)
+
+        elif method == 'trimmean':
+            m_neigbr_r = _nan_trim_mean(r_vals, proportiontocut=0.1)
+
+    return xr.DataArray(m_neigbr_r.T, dims=['ch', 'epoch'],
+                        coords={'ch': ch_names,
+                                'epoch': np.arange(len(epochs))})
 
 
 # TODO: check that annot type contains all unique flags
@@ -358,18 +508,19 @@ def marks_flag_gap(raw, min_gap_ms, included_annot_type=None,
     if len(raw.annotations) == 0:
         return mne.Annotations([], [], [], orig_time=raw.annotations.orig_time)
 
-    ret_val = np.array([[annot['onset'], annot['duration']]
-                        for annot in raw.annotations
-                        if annot['description'] in included_annot_type]).T
-
-    if len(ret_val) == 0:
+    annots = raw.annotations
+    included = np.isin(annots.description, included_annot_type)
+    if not included.any():
         return mne.Annotations([], [], [], orig_time=raw.annotations.orig_time)
 
-    onsets, durations = ret_val
-    offsets = onsets + durations
-    gaps = np.array([min(onset - offsets[offsets < onset])
-                     if np.sum(offsets < onset) else np.inf
-                     for onset in onsets[1:]])
+    onsets = annots.onset[included]
+    offsets = np.sort(onsets + annots.duration[included])
+
+    # For each onset, find the latest offset that precedes it.
+    ind_prev = np.searchsorted(offsets, onsets[1:], side='left') - 1
+    has_prev = ind_prev >= 0
+    gaps = np.full(len(onsets) - 1, np.inf)
+    gaps[has_prev] = onsets[1:][has_prev] - offsets[ind_prev[has_prev]]
     gap_mask = gaps < min_gap_ms / 1000
 
     return mne.Annotations(onset=onsets[1:][gap_mask] - gaps[gap_mask],
@@ -378,6 +529,41 @@ def marks_flag_gap(raw, min_gap_ms, included_annot_type=None,
                            orig_time=raw.annotations.orig_time)
 
 
+@lru_cache(maxsize=None)
+def _check_blas():
+    """Warn, once per session, if no optimized BLAS library is used."""
+    # threadpoolctl only reports the optimized implementations it can
+    # control (OpenBLAS, MKL, BLIS, ...); the reference BLAS is several times
+    # slower for the ICA.
+    blas = [info['internal_api'] for info in threadpool_info()
+            if info['user_api'] == 'blas']
+    # Some optimized libraries, such as Apple Accelerate, have no threadpoolctl
+    # controller, so also check the BLAS that NumPy was built against.
+    try:
+        build_blas = np.show_config(mode='dicts')['Build Dependencies']['blas']
+    except (TypeError, KeyError):  # NumPy < 1.26
+        build_blas = {}
+    if (build_blas.get('found') and
+            build_blas.get('name') not in ('blas', 'cblas', 'refblas')):
+        blas.append(build_blas['name'])
+
+    if not blas:
+        logger.warning('No optimized BLAS library (e.g., OpenBLAS, MKL, or '
+                       'Accelerate) was found for NumPy. Fitting the ICAs '
+                       'will be slow.')
+    return blas
+
+
+def _hash_ica_input(epochs, ica_kwargs):
+    """Hash the data, channels, and arguments that determine an ICA fit."""
+    hasher = hashlib.blake2b(digest_size=16)
+    hasher.update(np.ascontiguousarray(_get_data(epochs)).data)
+    hasher.update(json.dumps([epochs.ch_names, epochs.info['sfreq'],
+                              ica_kwargs, mne.__version__],
+                             sort_keys=True, default=str).encode())
+    return hasher.hexdigest()
+
+
 def coregister(raw_edf, fiducials="estimated",  # get fiducials from fsaverage
                show_coreg=False, verbose=False):
     """Coregister Raw object to `'fsaverage'`.
@@ -438,6 +624,13 @@ def warp_locs(self, raw):
             # MNE does not apply the transform to the montage permanently.
 
 
+def _run_recording(config, bids_path):
+    """Run and save the pipeline for one recording in a run_dataset worker."""
+    pipeline = LosslessPipeline()
+    pipeline.config = config
+    pipeline.run(bids_path)
+
+
 class LosslessPipeline():
     """Class used to handle pipeline parameters."""
 
@@ -460,6 +653,21 @@ class LosslessPipeline():
         self.ica1 = None
         self.ica2 = None
 
+    @property
+    def raw(self):
+        """The mne.io.Raw object processed by the pipeline."""
+        return self._raw
+
+    @raw.setter
+    def raw(self, raw):
+        self._raw = raw
+        # Release the epochs of the previous raw object.
+        self._clear_epochs_cache()
+
+    def _clear_epochs_cache(self):
+        """Drop the epochs cached by get_epochs."""
+        self._epochs_cache = (None, None)
+
     def load_config(self):
         """Load the config file."""
         self.config = Config().read(self.config_fname)
@@ -480,6 +688,7 @@ class LosslessPipeline():
             montage_kwargs = self.config['project']['set_montage_kwargs']
             self.raw.set_montage(montage,
                                  **montage_kwargs)
+            self._clear_epochs_cache()
         else:  # If the montage is a filepath of a custom montage
             raise ValueError('self.config["project"]["analysis_montage"]'
                              ' should be one of the default MNE montages as'
@@ -539,7 +748,21 @@ class LosslessPipeline():
         -------
         Epochs : mne.Epochs
             an instance of mne.Epochs
+
+        Notes
+        -----
+        The epochs are cached and returned as is by subsequent calls until
+        the raw object, its length, its annotations, the flagged channels,
+        the epoching config, or the arguments of this method change. Copy
+        them before modifying them in place. The pipeline methods that modify
+        the raw data clear this cache; after modifying ``self.raw`` in place
+        by other means, assign it again (``pipeline.raw = pipeline.raw``) to
+        clear it.
         """
+        key = self._get_epochs_key(detrend, preload, rereference, picks)
+        if self._epochs_cache[0] == key:
+            return self._epochs_cache[1]
+
         # TODO: automatically load detrend/preload description from MNE.
         logger.info("🧹 Epoching..")
         events = self.get_events()
@@ -556,8 +779,22 @@ class LosslessPipeline():
         if rereference:
             self.flags["ch"].rereference(epochs)
 
+        self._epochs_cache = (key, epochs)
         return epochs
 
+    def _get_epochs_key(self, detrend, preload, rereference, picks):
+        """Summarize the state on which the output of get_epochs depends."""
+        annots = self.raw.annotations
+        # The epoching config is mutable, so a serialized copy is compared.
+        epoching = json.dumps(self.config['epoching'], sort_keys=True,
+                              default=str)
+        return (self.raw.first_samp, self.raw.n_times,
+                tuple(self.raw.info['bads']),
+                tuple(self.flags["ch"]['manual']),
+                tuple(zip(annots.onset, annots.duration, annots.description)),
+                epoching, detrend, preload, rereference,
+                tuple(np.atleast_1d(picks).tolist()))
+
     def run_staging_script(self):
         """Run a staging script if specified in config."""
         # TODO:
@@ -565,6 +802,8 @@ class LosslessPipeline():
             staging_script = Path(self.config['staging_script'])
             if staging_script.exists():
                 exec(staging_script.open().read())
+                # The script can modify the raw data in place.
+                self._clear_epochs_cache()
 
     @lossless_logger
     def find_breaks(self):
@@ -637,26 +876,27 @@ class LosslessPipeline():
         else:
             raise TypeError('inst must be an MNE Raw or Epochs object,'
                             f' but got {type(inst)}.')
-        epochs_xr = epochs_to_xr(epochs, kind="ch")
-
         # Determines comically bad channels,
         # and leaves them out of average rereference
-        trim_ch_sd = epochs_xr.std('time')
+        trim_ch_sd = _get_epochs_sd(epochs, kind="ch")
+        ch_names = trim_ch_sd.ch.values
+        # The arrays are small; plain NumPy avoids the xarray overhead.
+        trim_ch_sd = trim_ch_sd.transpose("epoch", "ch").values
         # Measure how diff the std of 1 channel is with respect
         # to other channels (nonparametric z-score)
-        ch_dist = trim_ch_sd - trim_ch_sd.median(dim="ch")
-        perc_30 = trim_ch_sd.quantile(0.3, dim="ch")
-        perc_70 = trim_ch_sd.quantile(0.7, dim="ch")
-        ch_dist /= perc_70 - perc_30  # shape (chans, epoch)
+        perc_30, mdn, perc_70 = np.quantile(trim_ch_sd, [0.3, 0.5, 0.7],
+                                            axis=1, keepdims=True)
+        ch_dist = trim_ch_sd - mdn
+        ch_dist /= perc_70 - perc_30  # shape (epoch, chans)
 
-        mean_ch_dist = ch_dist.mean(dim="epoch")  # shape (chans)
+        mean_ch_dist = ch_dist.mean(axis=0)  # shape (chans)
 
         # find the median and 30 and 70 percentiles
         # of the mean of the channel distributions
-        mdn = np.median(mean_ch_dist)
-        deviation = np.diff(np.quantile(mean_ch_dist, [0.3, 0.7]))
+        low, mdn, high = np.quantile(mean_ch_dist, [0.3, 0.5, 0.7])
+        deviation = high - low
 
-        return mean_ch_dist.ch[mean_ch_dist > mdn+6*deviation].values.tolist()
+        return ch_names[mean_ch_dist > mdn+6*deviation].tolist()
 
     def flag_channels_fixed_threshold(self, threshold=5e-5):
         """Flag channels based on the stdev value across the time dimension.
@@ -739,8 +979,7 @@ class LosslessPipeline():
         """
         # TODO: flag "ch_sd" should be renamed "time_sd"
         # TODO: doc for step 3 and 4 need to be updated
-        epochs_xr = epochs_to_xr(self.get_epochs(), kind="ch")
-        data_sd = epochs_xr.std("time")
+        data_sd = _get_epochs_sd(self.get_epochs(), kind="ch")
 
         # flag channels for ch_sd
         bad_ch_names = _detect_outliers(data_sd, flag_dim='ch',
@@ -757,8 +996,7 @@ class LosslessPipeline():
         # TODO: flag "ch_sd" should be renamed "time_sd"
         outlier_methods = ('quantile', 'trimmed', 'fixed')
         epochs = self.get_epochs()
-        epochs_xr = epochs_to_xr(epochs, kind="ch")
-        data_sd = epochs_xr.std("time")
+        data_sd = _get_epochs_sd(epochs, kind="ch")
 
         # flag epochs for ch_sd
         if 'epoch_ch_sd' in self.config:
@@ -819,23 +1057,21 @@ class LosslessPipeline():
         # Uses the correlation of neighbours
         # calculated to flag bridged channels.
 
-        msr = data_r_ch.median("epoch") / data_r_ch.reduce(scipy.stats.iqr,
-                                                           dim="epoch")
+        # median and IQR across epochs from a single quantile computation
+        axis = data_r_ch.get_axis_num("epoch")
+        perc_25, mdn, perc_75 = np.quantile(data_r_ch, [0.25, 0.5, 0.75],
+                                            axis=axis)
+        msr = mdn / (perc_75 - perc_25)
 
         trim = self.config['bridge']['bridge_trim']
         if trim >= 1:
             trim /= 100
         trim /= 2
 
-        trim_mean = partial(scipy.stats.mstats.trimmed_mean,
-                            limits=(trim, trim))
-        trim_std = partial(scipy.stats.mstats.trimmed_std,
-                           limits=(trim, trim))
+        trim_mean, trim_std = _trim_mean_std(msr, trim=trim)
 
         z_val = self.config['bridge']['bridge_z']
-        mask = (msr > msr.reduce(trim_mean, dim="ch")
-                + z_val*msr.reduce(trim_std, dim="ch")
-                )
+        mask = msr > trim_mean + z_val*trim_std
 
         bad_ch_names = data_r_ch.ch.values[mask]
         logger.info(f'📋 LOSSLESS: Bridged channels: {bad_ch_names}')
@@ -914,16 +1150,37 @@ class LosslessPipeline():
 
         epochs = self.get_epochs()
         if run == 'run1':
-            self.ica1 = ICA(**ica_kwargs)
-            self.ica1.fit(epochs)
+            self.ica1 = self._fit_ica(epochs, ica_kwargs)
 
         elif run == 'run2':
-            self.ica2 = ICA(**ica_kwargs)
-            self.ica2.fit(epochs)
+            self.ica2 = self._fit_ica(epochs, ica_kwargs)
             self.flags["ic"].label_components(epochs, self.ica2)
         else:
             raise ValueError("The `run` argument must be 'run1' or 'run2'")
 
+    def _fit_ica(self, epochs, ica_kwargs):
+        """Fit an ICA, or load it from the ICA cache directory if enabled."""
+        cache_dir = self.config['ica'].get('cache_dir')
+        if cache_dir:
+            fname = Path(cache_dir) / (_hash_ica_input(epochs, ica_kwargs) +
+                                       '_ica.fif')
+            if fname.exists():
+                logger.info(f'Loading the cached ICA {fname}.')
+                return mne.preprocessing.read_ica(fname)
+
+        # The fit is dominated by BLAS calls (whitening, PCA, unmixing
+        # updates); bound their thread pool when requested in the config.
+        blas_threads = self.config['ica'].get('blas_threads')
+        _check_blas()
+        ica = ICA(**ica_kwargs)
+        with threadpool_limits(limits=blas_threads, user_api='blas'):
+            ica.fit(epochs)
+
+        if cache_dir:
+            fname.parent.mkdir(parents=True, exist_ok=True)
+            ica.save(fname, overwrite=True)
+        return ica
+
     @lossless_logger
     def flag_epoch_ic_sd1(self):
         """Calculate the IC standard Deviation by epoch window.
@@ -932,8 +1189,7 @@ class LosslessPipeline():
         """
         # Calculate IC sd by window
         epochs = self.get_epochs()
-        epochs_xr = epochs_to_xr(epochs, kind="ic", ica=self.ica1)
-        data_sd = epochs_xr.std('time')
+        data_sd = _get_epochs_sd(epochs, kind="ic", ica=self.ica1)
 
         # Create the windowing sd criteria
         kwargs = self.config['ica']['ic_ic_sd']
@@ -994,6 +1250,9 @@ class LosslessPipeline():
     @lossless_logger
     def filter(self):
         """Run filter procedure based on structured config args."""
+        # The data is modified in place, so cached epochs are now stale.
+        self._clear_epochs_cache()
+
         # 5.a. Filter lowpass/highpass
         self.raw.filter(**self.config['filtering']['filter_args'])
 
@@ -1098,7 +1357,10 @@ class LosslessPipeline():
         # 14. Flag very small time periods between flagged time
         self.flag_epoch_gap()
 
-    def run_dataset(self, paths):
+        # Release the cached epochs once the run is complete.
+        self._clear_epochs_cache()
+
+    def run_dataset(self, paths, n_jobs=1):
         """Run a full dataset.
 
         Parameters
@@ -1106,9 +1368,24 @@ class LosslessPipeline():
         paths : list | tuple
             a list of the bids_paths for all recordings in the dataset that
             should be run.
+        n_jobs : int | None (default 1)
+            Number of recordings to process in parallel, as interpreted by
+            joblib. ``-1`` uses all available cores. If this resolves to more
+            than one worker, each recording is processed and saved by a new
+            pipeline with the same configuration in a separate worker
+            process, so the state of this object is not updated.
         """
-        for path in paths:
-            self.run(path)
+        if effective_n_jobs(n_jobs) == 1:
+            for path in paths:
+                self.run(path)
+            return
+
+        # The loky backend limits the BLAS threads of each worker so that
+        # the nested parallelism of the ICA fits does not oversubscribe.
+        # Only the configuration is sent to the workers, not the raw data,
+        # epochs, or ICAs held by this pipeline.
+        Parallel(n_jobs=n_jobs)(delayed(_run_recording)(self.config, path)
+                                for path in paths)
 
     # TODO: Finish docstring
     def load_ll_derivative(self, derivatives_path):
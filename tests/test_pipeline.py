@@ -3,7 +3,15 @@ import shutil
 from time import sleep
 import pytest
 
+import numpy as np
+import scipy
+from scipy.stats import mstats
+
 import pylossless as ll
+import pylossless.pipeline as pipeline_module
+from pylossless.pipeline import (chan_neighbour_r, marks_flag_gap, _check_blas,
+                                 _get_neighbours, _hash_ica_input,
+                                 _trim_mean_std)
 
 import mne
 import mne_bids
@@ -100,3 +108,228 @@ def test_find_breaks(logging):
     else:
         pipeline.find_breaks()
     Path('find_breaks_config.yaml').unlink()  # delete config file
+
+
+def make_random_raw(n_chans=16, sfreq=100., duration=20., seed=0):
+    """Make a short raw object with correlated EEG on a standard montage."""
+    rng = np.random.default_rng(seed)
+    montage = mne.channels.make_standard_montage('standard_1020')
+    info = mne.create_info(montage.ch_names[:n_chans], sfreq, 'eeg')
+    n_times = int(sfreq * duration)
+    sources = rng.standard_normal((4, n_times))
+    data = rng.standard_normal((n_chans, 4)) @ sources
+    data += 0.5 * rng.standard_normal((n_chans, n_times))
+    raw = mne.io.RawArray(data * 1e-6, info, verbose=False)
+    raw.set_montage(montage)
+    return raw
+
+
+@pytest.mark.parametrize('flat', [False, True])
+@pytest.mark.parametrize('method', ['max', 'mean', 'trimmean'])
+def test_chan_neighbour_r(method, flat):
+    """Compare neighbour correlations to a direct np.corrcoef reference."""
+    nneigbr = 10
+    raw = make_random_raw()
+    if flat:
+        # A flat channel has no defined correlation. It is skipped in the
+        # aggregation of its neighbours and gets NaN itself.
+        raw._data[0] = 0.
+    epochs = mne.make_fixed_length_epochs(raw, duration=2., preload=True,
+                                          verbose=False)
+    m_neigbr_r = chan_neighbour_r(epochs, nneigbr, method)
+
+    ch_pos = epochs.get_montage().get_positions()['ch_pos']
+    ch_names = list(ch_pos)
+    chan_locs = np.array(list(ch_pos.values()))
+    dist = scipy.spatial.distance_matrix(chan_locs, chan_locs)
+    nbr_idx = np.argsort(dist, axis=1)[:, 1:nneigbr + 1]
+
+    data = epochs.get_data(picks=ch_names)
+    expected = np.full((len(ch_names), len(epochs)), np.nan)
+    for i_epoch, epoch in enumerate(data):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = np.abs(np.corrcoef(epoch))
+        nbr_r = np.take_along_axis(corr, nbr_idx, axis=1)
+        for i_ch, row in enumerate(nbr_r):
+            row = row[~np.isnan(row)]
+            if not row.size:
+                continue
+            if method == 'max':
+                expected[i_ch, i_epoch] = row.max()
+            elif method == 'mean':
+                expected[i_ch, i_epoch] = row.mean()
+            else:
+                expected[i_ch, i_epoch] = scipy.stats.trim_mean(row, 0.1)
+
+    assert m_neigbr_r.dims == ('ch', 'epoch')
+    assert list(m_neigbr_r.ch.values) == ch_names
+    nan_chs = m_neigbr_r.ch[np.isnan(m_neigbr_r).any('epoch')].values
+    assert list(nan_chs) == (raw.ch_names[:1] if flat else [])
+    np.testing.assert_allclose(m_neigbr_r.values, expected, atol=1e-5)
+
+
+def test_chan_neighbour_r_few_channels():
+    """Test that the neighbours are limited to the available channels."""
+    raw = make_random_raw(n_chans=3)
+    epochs = mne.make_fixed_length_epochs(raw, duration=2., preload=True,
+                                          verbose=False)
+    ch_names, nbr_idx = _get_neighbours(epochs, 3)
+    assert nbr_idx.shape == (3, 2)
+    for i_ch, row in enumerate(nbr_idx):
+        assert sorted(row) == sorted(set(range(3)) - {i_ch})
+
+    m_neigbr_r = chan_neighbour_r(epochs, 3, 'max')
+    # The diagonal is removed so that only the other channels are compared.
+    expected = [np.abs(np.corrcoef(epoch) - np.eye(3)).max(axis=1)
+                for epoch in epochs.get_data(picks=ch_names)]
+    np.testing.assert_allclose(m_neigbr_r.values, np.array(expected).T,
+                               atol=1e-5)
+
+
+@pytest.mark.parametrize('n_values', [5, 10, 13, 64])
+def test_trim_mean_std(n_values):
+    """Compare the trimmed statistics to scipy.stats.mstats."""
+    array = np.random.default_rng(0).standard_normal((3, n_values))
+    trim_mean, trim_std = _trim_mean_std(array, trim=0.2)
+    limits = (0.2, 0.2)
+    np.testing.assert_allclose(
+        trim_mean, mstats.trimmed_mean(array, limits=limits, axis=-1))
+    np.testing.assert_allclose(
+        trim_std, mstats.trimmed_std(array, limits=limits, axis=-1))
+
+
+def test_marks_flag_gap():
+    """Test that only short gaps between pylossless flags are marked."""
+    raw = make_random_raw()
+    raw.set_annotations(mne.Annotations(
+        onset=[1., 2.5, 4., 9.5, 10.],
+        duration=[1., 1., 1., 0.5, 1.],
+        description=['bad_pylossless_ch_sd', 'bad_pylossless_low_r',
+                     'bad_pylossless_ic_sd1', 'other_annot',
+                     'bad_pylossless_ch_sd']))
+    annots = marks_flag_gap(raw, min_gap_ms=1000)
+    # The gaps [2, 2.5] and [3.5, 4] are short; [5, 10] is not, and
+    # 'other_annot' is not a pylossless flag.
+    np.testing.assert_allclose(annots.onset, [2., 3.5])
+    np.testing.assert_allclose(annots.duration, [0.5, 0.5])
+    assert list(annots.description) == ['bad_pylossless_gap'] * 2
+
+
+def test_get_epochs_cache():
+    """Test that cached epochs are not reused once their inputs change."""
+    config = ll.config.Config()
+    config.load_default()
+    pipeline = ll.LosslessPipeline()
+    pipeline.config = config
+    pipeline.raw = make_random_raw(seed=0)
+
+    epochs = pipeline.get_epochs()
+    assert pipeline.get_epochs() is epochs
+
+    # The epoching config is modified in place, as the user would.
+    config['epoching']['epochs_args']['tmax'] = 0.5
+    short_epochs = pipeline.get_epochs()
+    assert short_epochs is not epochs
+    assert short_epochs.tmax < epochs.tmax
+    config['epoching']['epochs_args']['tmax'] = 1
+
+    pipeline.raw.crop(tmax=10.)
+    cropped_epochs = pipeline.get_epochs()
+    assert len(cropped_epochs) < len(epochs)
+
+    pipeline.raw = make_random_raw(seed=1).crop(tmax=10.)
+    new_epochs = pipeline.get_epochs()
+    assert new_epochs is not cropped_epochs
+    assert not np.allclose(new_epochs.get_data(), cropped_epochs.get_data())
+
+
+def test_run_dataset_parallel(tmp_path):
+    """Test that run_dataset with n_jobs > 1 saves every derivative."""
+    config = ll.config.Config()
+    config.load_default()
+    config['project']['analysis_montage'] = 'standard_1020'
+    # Extended infomax is slow to converge on random data.
+    config['ica']['ica_args']['run2'] = {'method': 'fastica'}
+    bids_root = tmp_path / 'bids'
+    paths = []
+    for subject in ['01', '02']:
+        raw = make_random_raw(sfreq=256., duration=60., seed=int(subject))
+        bids_path = mne_bids.BIDSPath(subject=subject, task='rest',
+                                      datatype='eeg', root=bids_root)
+        mne_bids.write_raw_bids(raw, bids_path, format='EDF',
+                                allow_preload=True, verbose=False)
+        paths.append(bids_path)
+
+    pipeline = ll.LosslessPipeline()
+    pipeline.config = config
+    pipeline.run_dataset(paths, n_jobs=2)
+    for bids_path in paths:
+        derivative_path = pipeline.get_derivative_path(bids_path)
+        for suffix, extension in [('eeg', '.edf'), ('iclabels', '.tsv')]:
+            fpath = derivative_path.copy().update(suffix=suffix,
+                                                  extension=extension,
+                                                  check=False).fpath
+            assert fpath.exists()
+
+
+@pytest.mark.parametrize('threadpool_blas, build_blas, warns', [
+    ('openblas', 'openblas', False),
+    (None, 'accelerate', False),  # no threadpoolctl controller
+    (None, 'blas', True),  # reference BLAS
+])
+def test_check_blas(monkeypatch, caplog, threadpool_blas, build_blas, warns):
+    """Test that only a reference BLAS triggers the slow ICA warning."""
+    threadpool_info = []
+    if threadpool_blas:
+        threadpool_info.append({'user_api': 'blas',
+                                'internal_api': threadpool_blas})
+    build_config = {'Build Dependencies': {'blas': {'name': build_blas,
+                                                    'found': True}}}
+    monkeypatch.setattr(pipeline_module, 'threadpool_info',
+                        lambda: threadpool_info)
+    monkeypatch.setattr(np, 'show_config', lambda mode: build_config)
+
+    _check_blas.cache_clear()
+    try:
+        with caplog.at_level('WARNING'):
+            blas = _check_blas()
+    finally:
+        _check_blas.cache_clear()
+    assert bool(blas) is not warns
+    assert ('No optimized BLAS' in caplog.text) is warns
+
+
+def test_ica_cache(tmp_path, monkeypatch):
+    """Test that fitted ICAs are cached and reloaded from cache_dir."""
+    config = ll.config.Config()
+    config.load_default()
+    config['ica']['cache_dir'] = str(tmp_path)
+    pipeline = ll.LosslessPipeline()
+    pipeline.config = config
+    epochs = mne.make_fixed_length_epochs(make_random_raw(), duration=1.,
+                                          preload=True, verbose=False)
+    ica_kwargs = {'method': 'fastica', 'max_iter': 'auto',
+                  'random_state': 97}
+
+    # A cache miss fits the ICA and writes it under the hash of its input.
+    key = _hash_ica_input(epochs, ica_kwargs)
+    ica = pipeline._fit_ica(epochs, ica_kwargs)
+    assert (tmp_path / f'{key}_ica.fif').exists()
+
+    # A cache hit loads the same ICA without fitting it again.
+    def fail_fit(*args, **kwargs):
+        raise AssertionError('The ICA should be loaded from the cache.')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(mne.preprocessing.ICA, 'fit', fail_fit)
+        cached_ica = pipeline._fit_ica(epochs, ica_kwargs)
+    np.testing.assert_allclose(cached_ica.unmixing_matrix_,
+                               ica.unmixing_matrix_)
+    np.testing.assert_allclose(cached_ica.get_sources(epochs).get_data(),
+                               ica.get_sources(epochs).get_data())
+
+    # The key changes with the data and with the ICA arguments.
+    assert _hash_ica_input(epochs, dict(ica_kwargs, random_state=0)) != key
+    modified_epochs = epochs.copy()
+    modified_epochs._data[0, 0, 0] += 1e-6
+    assert _hash_ica_input(modified_epochs, ica_kwargs) != key